@@ -0,0 +1,633 @@
+from fastapi import APIRouter, FastAPI, HTTPException, Request
+from fastapi.responses import HTMLResponse, JSONResponse, FileResponse, Response
+from fastapi.staticfiles import StaticFiles
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.routing import APIRoute
+from pydantic import AfterValidator, BaseModel, BeforeValidator, Field, StrictInt
+from starlette.concurrency import run_in_threadpool
+
+import asyncio
+import collections
+import orjson
+import os
+import sqlite3
+import queue
+import uuid
+import random
+import datetime
+from contextlib import asynccontextmanager, contextmanager
+from typing import Annotated, Literal, Optional
+
+from schemas import (
+    EDUCATION,
+    ENUM_COLUMNS,
+    GENDER,
+    MARITAL_STATUS,
+    RESIDENCE,
+    SOCIOECONOMIC,
+    SPEAK_ENGLISH,
+    init_schema,
+    iso_to_us,
+    now_us,
+    pid_bytes,
+)
+
+ISRAEL_TZ = datetime.timezone(datetime.timedelta(hours=2))
+
+
+def us_to_israel_time(us: int):
+    # Rows store unix microseconds; the admin page shows them the old way
+    return datetime.datetime.fromtimestamp(us / 1_000_000, ISRAEL_TZ).isoformat()
+
+
+class ORJSONResponse(JSONResponse):
+    # fastapi.responses.ORJSONResponse is deprecated upstream; this is the same thing
+    def render(self, content) -> bytes:
+        return orjson.dumps(content)
+
+
+class ORJSONRequest(Request):
+    async def json(self):
+        # orjson.JSONDecodeError subclasses json's, so bad bodies are still a 422
+        if not hasattr(self, "_json"):
+            self._json = orjson.loads(await self.body())
+        return self._json
+
+
+class ORJSONRoute(APIRoute):
+    # FastAPI reads JSON bodies through request.json(), which is stdlib json
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+
+        async def orjson_handler(request: Request):
+            return await handler(ORJSONRequest(request.scope, request.receive))
+
+        return orjson_handler
+
+
+DB = "experiment.db"
+
+
+def _configure(con):
+    # Per-connection settings; journal_mode=WAL is persistent and set once at INIT
+    con.execute("PRAGMA busy_timeout=5000")
+    con.execute("PRAGMA synchronous=NORMAL")
+    con.execute("PRAGMA temp_store=MEMORY")
+    con.execute("PRAGMA cache_size=-64000")
+    return con
+
+
+def db():
+    # Autocommit: each statement is its own transaction unless we BEGIN explicitly
+    con = sqlite3.connect(
+        DB, check_same_thread=False, isolation_level=None, cached_statements=256
+    )
+    return _configure(con)
+
+
+# ---------- CONNECTION POOL ----------
+# Built at import, so each uvicorn worker process gets its own pool (and WRITER)
+POOL_SIZE = 8
+_POOL = queue.LifoQueue(maxsize=POOL_SIZE)
+for _ in range(POOL_SIZE):
+    _POOL.put(db())
+
+
+@contextmanager
+def get_conn():
+    # A None slot is a connection that couldn't be reopened; try again now
+    con = _POOL.get()
+    if con is None:
+        try:
+            con = db()
+        except BaseException:
+            _POOL.put(None)
+            raise
+    try:
+        yield con
+    except sqlite3.IntegrityError:
+        # A constraint failure leaves the connection itself usable
+        if con.in_transaction:
+            con.rollback()
+        raise
+    except sqlite3.Error:
+        # Don't hand a possibly broken connection to the next request
+        con.close()
+        con = None
+        con = db()
+        raise
+    except BaseException:
+        if con.in_transaction:
+            con.rollback()
+        raise
+    finally:
+        _POOL.put(con)
+
+
+# ---------- PARTICIPANT IDS ----------
+PID_BATCH = 256
+_PIDS = collections.deque()
+
+
+def next_participant():
+    # (uuid, stress_condition); one urandom read per PID_BATCH ids
+    if not _PIDS:
+        raw = os.urandom(16 * PID_BATCH)
+        bits = random.getrandbits(PID_BATCH)
+        _PIDS.extend(
+            (uuid.UUID(bytes=raw[i * 16:(i + 1) * 16], version=4), (bits >> i) & 1)
+            for i in range(PID_BATCH)
+        )
+    return _PIDS.popleft()
+
+
+# ---------- SQL ----------
+SQL_START = """
+    INSERT INTO experiment_results (
+        participant_id, stress_condition, created_at, completed_at
+    ) VALUES (?,?,?,?)
+"""
+
+SQL_SAVE_CONSENT = "UPDATE experiment_results SET consent_given=? WHERE participant_id=? RETURNING 1"
+
+SQL_SAVE_DEMO = """
+    UPDATE experiment_results
+    SET speak_english=?,
+        age=?,
+        gender=?,
+        residence=?,
+        socioeconomic=?,
+        marital_status=?,
+        education=?
+    WHERE participant_id=?
+    RETURNING 1
+"""
+
+SQL_SAVE_REP = (
+    "UPDATE experiment_results SET "
+    + ", ".join(f"repression_q{i}=?" for i in range(1, 16))
+    + " WHERE participant_id=? RETURNING 1"
+)
+
+SQL_SAVE_RATING = "UPDATE experiment_results SET stress_level=? WHERE participant_id=? RETURNING 1"
+
+SQL_FINISH = "UPDATE experiment_results SET completed_at=? WHERE participant_id=? RETURNING 1"
+
+SQL_SUBMIT_DISAGREE = """
+    INSERT INTO experiment_results (
+        participant_id, stress_condition, created_at, completed_at, consent_given
+    ) VALUES (?,?,?,?,?)
+"""
+
+SQL_SUBMIT_ALL = """
+    INSERT INTO experiment_results (
+        participant_id,
+        stress_condition,
+        created_at,
+        completed_at,
+        consent_given,
+        speak_english,
+        age,
+        gender,
+        residence,
+        socioeconomic,
+        marital_status,
+        education,
+        repression_q1,
+        repression_q2,
+        repression_q3,
+        repression_q4,
+        repression_q5,
+        repression_q6,
+        repression_q7,
+        repression_q8,
+        repression_q9,
+        repression_q10,
+        repression_q11,
+        repression_q12,
+        repression_q13,
+        repression_q14,
+        repression_q15,
+        stress_level
+    ) VALUES (
+        ?, ?, ?, ?,
+        ?, ?, ?, ?, ?,
+        ?, ?, ?,
+        ?, ?, ?, ?,
+        ?, ?, ?, ?,
+        ?, ?, ?, ?,
+        ?, ?, ?,
+        ?
+    )
+"""
+
+
+# ---------- PAYLOADS ----------
+# Invalid bodies are rejected by FastAPI with a 422 before the route runs
+ParticipantId = Annotated[bytes, BeforeValidator(pid_bytes)]
+
+
+class ConsentData(BaseModel):
+    consent_given: Literal[0, 1]
+
+
+class ConsentPayload(BaseModel):
+    participant_id: ParticipantId
+    data: ConsentData
+
+
+class DemoData(BaseModel):
+    speak_english: Literal["yes", "no"]
+    age: Annotated[StrictInt, Field(ge=18, le=99)]
+    gender: Literal["male", "female", "other"]
+    residence: Literal["north", "central", "south"]
+    socioeconomic: Literal["low", "medium", "high"]
+    marital_status: Literal["single", "married"]
+    education: Literal["until_high_school", "high_school", "ba", "masters_or_higher"]
+
+
+class DemoPayload(BaseModel):
+    participant_id: ParticipantId
+    data: DemoData
+
+
+class RepItem(BaseModel):
+    qIndex: Annotated[StrictInt, Field(ge=1, le=15)]
+    score: Annotated[StrictInt, Field(ge=1, le=5)]
+
+
+def rep_scores(items: list[RepItem]) -> list[int]:
+    # One pass into the 15 score slots, in column order
+    scores = [None] * 15
+    for item in items:
+        scores[item.qIndex - 1] = item.score
+    if None in scores:
+        missing = [i + 1 for i, v in enumerate(scores) if v is None]
+        raise ValueError(f"Missing repression answers: {missing}")
+    return scores
+
+
+# Clients send a list of RepItem; routes get back the rep_scores list
+RepItems = Annotated[list[RepItem], AfterValidator(rep_scores)]
+
+
+class RepPayload(BaseModel):
+    participant_id: ParticipantId
+    data: RepItems
+
+
+# The two frontends ask for the stress rating on different scales
+SliderRating = Annotated[StrictInt, Field(ge=0, le=100)]  # index.html
+ScaleRating = Annotated[StrictInt, Field(ge=1, le=10)]    # tyuta.html
+
+
+class SliderRatingData(BaseModel):
+    rating: SliderRating
+
+
+class SliderRatingPayload(BaseModel):
+    participant_id: ParticipantId
+    data: SliderRatingData
+
+
+class ScaleRatingData(BaseModel):
+    rating: ScaleRating
+
+
+class ScaleRatingPayload(BaseModel):
+    participant_id: ParticipantId
+    data: ScaleRatingData
+
+
+# /start hands out microseconds; pages loaded before that still send ISO strings.
+# Bounded to what fits a SQLite INTEGER, so bad values are a 422, not a bind error
+Timestamp = Annotated[int, BeforeValidator(iso_to_us), Field(ge=0, lt=2**63)]
+
+
+class DisagreePayload(BaseModel):
+    participant_id: ParticipantId
+    stress_condition: Literal[0, 1]
+    start_time: Optional[Timestamp] = None
+
+
+class SubmitAllData(BaseModel):
+    consent_given: Literal[1]
+    demo: DemoData
+    rep: RepItems
+    rating: SliderRating
+
+
+class SubmitAllPayload(BaseModel):
+    participant_id: ParticipantId
+    stress_condition: Literal[0, 1]
+    start_time: Optional[Timestamp] = None
+    data: SubmitAllData
+
+
+class FinishPayload(BaseModel):
+    participant_id: ParticipantId
+
+
+# ---------- WRITES ----------
+# Every write goes through WRITER, which commits whatever has queued up
+# in one transaction: under load the fsync is shared by up to WRITE_BATCH
+# requests, and when idle a lone write is committed straight away
+WRITE_BATCH = 50
+WRITE_BACKLOG = 1000
+
+
+def _execute_now(sql: str, params):
+    with get_conn() as con:
+        return con.execute(sql, params).fetchall()
+
+
+def _commit_batch(items):
+    # Each statement runs in its own savepoint, so one that fails is undone and
+    # handed back to its request alone; only BEGIN or COMMIT failing fails the
+    # whole batch
+    results = []
+    with get_conn() as con:
+        con.execute("BEGIN IMMEDIATE")
+        for sql, params, _ in items:
+            con.execute("SAVEPOINT s")
+            try:
+                results.append(con.execute(sql, params).fetchall())
+            except Exception as e:
+                con.execute("ROLLBACK TO s")
+                results.append(e)
+            con.execute("RELEASE s")
+        con.execute("COMMIT")
+    return results
+
+
+class GroupCommit:
+    def __init__(self):
+        self._queue = None
+        self._task = None
+        self._closing = False
+
+    async def start(self):
+        self._queue = asyncio.Queue(maxsize=WRITE_BACKLOG)
+        self._closing = False
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        # New writes run inline from here on; everything already queued still
+        # commits, including writes that were waiting for room in the queue
+        self._closing = True
+        await self._queue.put(None)
+        await self._task
+        while not self._queue.empty():
+            await self._commit(self._take(self._queue.get_nowait()))
+        self._task = None
+
+    async def execute(self, sql: str, params):
+        # Returns the statement's rows once they are committed
+        if self._task is None or self._closing:
+            return await run_in_threadpool(_execute_now, sql, params)
+        fut = asyncio.get_running_loop().create_future()
+        await self._queue.put((sql, params, fut))
+        return await fut
+
+    def _take(self, first):
+        # first plus whatever else is queued, up to WRITE_BATCH items
+        items = [first]
+        while len(items) < WRITE_BATCH and not self._queue.empty():
+            items.append(self._queue.get_nowait())
+        return items
+
+    async def _run(self):
+        stopping = False
+        while not stopping:
+            items = self._take(await self._queue.get())
+            stopping = None in items
+            await self._commit(items)
+
+    async def _commit(self, items):
+        batch = [item for item in items if item is not None]
+        if not batch:
+            return
+        try:
+            results = await run_in_threadpool(_commit_batch, batch)
+        except Exception as e:
+            # One exception per request, so tracebacks don't chain across them
+            results = []
+            for _ in batch:
+                err = RuntimeError("write batch failed")
+                err.__cause__ = e
+                results.append(err)
+        for (_, _, fut), result in zip(batch, results):
+            if fut.done():
+                continue  # the request was cancelled while waiting
+            if isinstance(result, Exception):
+                fut.set_exception(result)
+            else:
+                fut.set_result(result)
+
+
+WRITER = GroupCommit()
+
+
+# ---------- ROUTES ----------
+# Fixed replies, serialized once and shared: Starlette never modifies a
+# Response while sending it (MutableHeaders copies the header list first)
+OK = Response(b'{"ok":true}', media_type="application/json")
+DONE = Response(b'{"done":true}', media_type="application/json")
+
+
+async def update_participant(sql: str, params):
+    # sql ends in RETURNING 1, so an empty result means no such participant
+    if not await WRITER.execute(sql, params):
+        raise HTTPException(status_code=404, detail="participant_id not found")
+
+
+def demo_values(demo: DemoData):
+    return (
+        SPEAK_ENGLISH[demo.speak_english],
+        demo.age,
+        GENDER[demo.gender],
+        RESIDENCE[demo.residence],
+        SOCIOECONOMIC[demo.socioeconomic],
+        MARITAL_STATUS[demo.marital_status],
+        EDUCATION[demo.education],
+    )
+
+
+def _save_routes(rating_payload: type[BaseModel]) -> APIRouter:
+    # Per-stage saves into a row that already exists; both variants expose these
+    router = APIRouter(route_class=ORJSONRoute)
+
+    @router.post("/save/consent")
+    async def save_consent(payload: ConsentPayload):
+        await update_participant(
+            SQL_SAVE_CONSENT, (payload.data.consent_given, payload.participant_id)
+        )
+        return OK
+
+    @router.post("/save/demo")
+    async def save_demo(payload: DemoPayload):
+        values = (*demo_values(payload.data), payload.participant_id)
+        await update_participant(SQL_SAVE_DEMO, values)
+        return OK
+
+    @router.post("/save/rep")
+    async def save_rep(payload: RepPayload):
+        await update_participant(SQL_SAVE_REP, (*payload.data, payload.participant_id))
+        return OK
+
+    @router.post("/save/rating")
+    async def save_rating(payload: rating_payload):
+        await update_participant(SQL_SAVE_RATING, (payload.data.rating, payload.participant_id))
+        return OK
+
+    @router.post("/finish")
+    async def finish(payload: FinishPayload):
+        await update_participant(SQL_FINISH, (now_us(), payload.participant_id))
+        return DONE
+
+    return router
+
+
+def _flat_routes() -> APIRouter:
+    # tyuta.html: /start creates the row, then each stage is saved into it
+    router = _save_routes(ScaleRatingPayload)
+
+    @router.post("/start")
+    async def start():
+        uid, stress = next_participant()
+        await WRITER.execute(SQL_START, (uid.bytes, stress, now_us(), None))
+        return {"participant_id": uid.hex, "stress_condition": stress}
+
+    return router
+
+
+def _flat_ext_routes() -> APIRouter:
+    # index.html: the browser keeps every answer and the row is written once at the end
+    router = _save_routes(SliderRatingPayload)
+
+    @router.post("/start")
+    async def start():
+        uid, stress = next_participant()
+        return {
+            "participant_id": uid.hex,
+            "stress_condition": stress,
+            "start_time": now_us()
+        }
+
+    @router.post("/submit_disagree")
+    async def submit_disagree(payload: DisagreePayload):
+        completed_at = now_us()
+        start_time = payload.start_time or completed_at
+
+        await WRITER.execute(
+            SQL_SUBMIT_DISAGREE,
+            (payload.participant_id, payload.stress_condition, start_time, completed_at, 0),
+        )
+        return OK
+
+    @router.post("/submit_all")
+    async def submit_all(payload: SubmitAllPayload):
+        data = payload.data
+        completed_at = now_us()
+        start_time = payload.start_time or completed_at
+
+        values = (
+            payload.participant_id,
+            payload.stress_condition,
+            start_time,
+            completed_at,
+            data.consent_given,
+            *demo_values(data.demo),
+            *data.rep,
+            data.rating,
+        )
+        await WRITER.execute(SQL_SUBMIT_ALL, values)
+        return OK
+
+    @router.get("/admin/results", response_class=HTMLResponse)
+    def get_results():
+        with get_conn() as con:
+            cur = con.cursor()
+            # cur.execute("SELECT * FROM experiment_results ORDER BY created_at DESC")
+            cur.execute("""
+                SELECT * FROM experiment_results
+                WHERE completed_at IS NOT NULL
+                ORDER BY created_at DESC
+            """)
+            rows = cur.fetchall()
+            cols = [description[0] for description in cur.description]
+
+        # Show BLOB ids as hex, demographic codes as their labels and timestamps
+        # as Israel time
+        labels = [
+            {code: label for label, code in ENUM_COLUMNS[c].items()} if c in ENUM_COLUMNS else {}
+            for c in cols
+        ]
+        times = [c in ("created_at", "completed_at") for c in cols]
+
+        html = "<html><head><meta charset='utf-8'><title>Results</title><style>table, th, td {border: 1px solid black; border-collapse: collapse; padding: 5px;}</style></head><body><h1>Experiment Results</h1><table>"
+        html += "<tr>" + "".join(f"<th>{c}</th>" for c in cols) + "</tr>"
+        for row in rows:
+            cells = (
+                v.hex() if isinstance(v, bytes)
+                else us_to_israel_time(v) if is_time and isinstance(v, int)
+                else names.get(v, v)
+                for v, names, is_time in zip(row, labels, times)
+            )
+            html += "<tr>" + "".join(f"<td>{v}</td>" for v in cells) + "</tr>"
+        html += "</table></body></html>"
+        return html
+
+    @router.get("/admin/download_db")
+    def download_db():
+        if not os.path.exists(DB):
+            raise HTTPException(status_code=404, detail="Database file not found.")
+        # Fold the WAL back into the main file so the download has every row
+        with get_conn() as con:
+            con.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        return FileResponse(DB, filename="experiment.db")
+
+    return router
+
+
+# ---------- APP ----------
+# "flat": per-stage saves (main_tyuta.py / tyuta.html)
+# "flat_ext": one-shot submit plus the admin pages (main.py / index.html)
+VARIANTS = {"flat": _flat_routes, "flat_ext": _flat_ext_routes}
+
+# Comma-separated origins allowed to call the API from another site. The pages
+# are served from this app (same origin), so by default there is no CORS at all
+ORIGINS = [o.strip() for o in os.environ.get("EXPERIMENT_ORIGIN", "").split(",") if o.strip()]
+
+
+@asynccontextmanager
+async def _lifespan(app: FastAPI):
+    await WRITER.start()
+    yield
+    await WRITER.stop()
+
+
+def make_app(variant: Literal["flat", "flat_ext"]) -> FastAPI:
+    with get_conn() as con:
+        init_schema(con)
+
+    app = FastAPI(default_response_class=ORJSONResponse, lifespan=_lifespan)
+
+    if ORIGINS:
+        # The pages only send JSON POSTs without cookies; max_age lets the
+        # browser reuse one preflight for a whole session
+        app.add_middleware(
+            CORSMiddleware,
+            allow_origins=ORIGINS,
+            allow_methods=["GET", "POST"],
+            allow_headers=["content-type"],
+            max_age=86400,
+        )
+
+    app.mount("/static", StaticFiles(directory="static"), name="static")
+    app.include_router(VARIANTS[variant]())
+
+    # Mounted last so it only sees paths no API route claimed; html=True serves
+    # index.html for "/" with ETag / Last-Modified handling
+    app.mount("/", StaticFiles(directory="static", html=True), name="pages")
+    return app
@@ -0,0 +1,159 @@
+import datetime
+import sqlite3
+import time
+
+# Bump SCHEMA_VERSION and append to MIGRATIONS whenever SQL_CREATE_RESULTS changes
+SCHEMA_VERSION = 3
+
+# Demographic answers are stored as these integer codes
+SPEAK_ENGLISH = {"no": 0, "yes": 1}
+GENDER = {"male": 0, "female": 1, "other": 2}
+RESIDENCE = {"north": 0, "central": 1, "south": 2}
+SOCIOECONOMIC = {"low": 0, "medium": 1, "high": 2}
+MARITAL_STATUS = {"single": 0, "married": 1}
+EDUCATION = {"until_high_school": 0, "high_school": 1, "ba": 2, "masters_or_higher": 3}
+
+ENUM_COLUMNS = {
+    "speak_english": SPEAK_ENGLISH,
+    "gender": GENDER,
+    "residence": RESIDENCE,
+    "socioeconomic": SOCIOECONOMIC,
+    "marital_status": MARITAL_STATUS,
+    "education": EDUCATION,
+}
+
+SQL_CREATE_RESULTS = """
+    CREATE TABLE experiment_results (
+        participant_id BLOB PRIMARY KEY,  -- uuid4().bytes
+
+        consent_given INTEGER,   -- 1 = agree, 0 = disagree
+
+        speak_english INTEGER,   -- 0 = no, 1 = yes
+        age INTEGER,
+        gender INTEGER,          -- 0 = male, 1 = female, 2 = other
+        residence INTEGER,       -- 0 = north, 1 = central, 2 = south
+        socioeconomic INTEGER,   -- 0 = low, 1 = medium, 2 = high
+        marital_status INTEGER,  -- 0 = single, 1 = married
+        education INTEGER,       -- 0 = until_high_school, 1 = high_school, 2 = ba, 3 = masters_or_higher
+
+        repression_q1  INTEGER,
+        repression_q2  INTEGER,
+        repression_q3  INTEGER,
+        repression_q4  INTEGER,
+        repression_q5  INTEGER,
+        repression_q6  INTEGER,
+        repression_q7  INTEGER,
+        repression_q8  INTEGER,
+        repression_q9  INTEGER,
+        repression_q10 INTEGER,
+        repression_q11 INTEGER,
+        repression_q12 INTEGER,
+        repression_q13 INTEGER,
+        repression_q14 INTEGER,
+        repression_q15 INTEGER,
+
+        stress_condition INTEGER NOT NULL,
+        stress_level INTEGER,
+
+        created_at INTEGER NOT NULL,  -- unix time, microseconds
+        completed_at INTEGER
+    ) WITHOUT ROWID
+"""
+
+
+def pid_bytes(s: str) -> bytes:
+    # Clients hold the hex form (dashes optional); the DB keys on the raw 16 bytes
+    if not isinstance(s, str):
+        raise ValueError("participant_id must be a string")
+    pid = bytes.fromhex(s.replace("-", ""))
+    if len(pid) != 16:
+        raise ValueError("participant_id must be a 32-digit hex UUID")
+    return pid
+
+
+def now_us() -> int:
+    return time.time_ns() // 1000
+
+
+def iso_to_us(s) -> int:
+    # Timestamps are stored as unix microseconds; ISO strings come from older
+    # rows and from clients that got their start_time before the switch
+    if isinstance(s, int) and not isinstance(s, bool):
+        return s
+    if not isinstance(s, str):
+        raise ValueError("timestamp must be an integer or an ISO 8601 string")
+    dt = datetime.datetime.fromisoformat(s)
+    return int(dt.timestamp() * 1_000_000)
+
+
+def _legacy_time(s):
+    try:
+        return iso_to_us(s)
+    except ValueError:
+        return s
+
+
+def _legacy_pid(s):
+    try:
+        return pid_bytes(s)
+    except ValueError:
+        return s
+
+
+def _enum_case(col):
+    codes = ENUM_COLUMNS[col]
+    return "CASE {} " + " ".join(f"WHEN '{k}' THEN {v}" for k, v in codes.items()) + " END"
+
+
+# MIGRATIONS[v] maps columns to SQL templates that turn a version-v value ({})
+# into its version v + 1 form
+MIGRATIONS = [
+    # 1: TEXT uuid -> 16-byte BLOB
+    {"participant_id": "legacy_pid({})"},
+    # 2: integer demographic codes, WITHOUT ROWID (so the key can't be NULL;
+    #    early /submit_disagree calls could store one)
+    {
+        **{col: _enum_case(col) for col in ENUM_COLUMNS},
+        "participant_id": "coalesce({}, randomblob(16))",
+    },
+    # 3: ISO 8601 TEXT timestamps -> INTEGER unix microseconds
+    {"created_at": "legacy_time({})", "completed_at": "legacy_time({})"},
+]
+
+
+def _migrate_results(con: sqlite3.Connection, version: int):
+    # Recreate experiment_results from SQL_CREATE_RESULTS, passing every old
+    # row through the pending MIGRATIONS in order
+    cols = [row[1] for row in con.execute("PRAGMA table_info(experiment_results)")]
+    exprs = []
+    for col in cols:
+        expr = col
+        for step in MIGRATIONS[version:]:
+            expr = step.get(col, "{}").format(expr)
+        exprs.append(expr)
+
+    con.create_function("legacy_pid", 1, _legacy_pid, deterministic=True)
+    con.create_function("legacy_time", 1, _legacy_time, deterministic=True)
+    con.execute("ALTER TABLE experiment_results RENAME TO experiment_results_old")
+    con.execute(SQL_CREATE_RESULTS)
+    con.execute(
+        f"INSERT INTO experiment_results ({', '.join(cols)}) "
+        f"SELECT {', '.join(exprs)} FROM experiment_results_old"
+    )
+    con.execute("DROP TABLE experiment_results_old")
+
+
+def init_schema(con: sqlite3.Connection):
+    # Safe to run on every startup, from any number of workers at once:
+    # the version check and any migration happen under one write lock
+    con.execute("PRAGMA journal_mode=WAL")
+    con.execute("BEGIN IMMEDIATE")
+    version = con.execute("PRAGMA user_version").fetchone()[0]
+    if not con.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name='experiment_results'"
+    ).fetchone():
+        con.execute(SQL_CREATE_RESULTS)
+    elif version < SCHEMA_VERSION:
+        _migrate_results(con, version)
+    con.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+    con.execute("COMMIT")